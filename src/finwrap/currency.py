@@ -1,58 +1,357 @@
 import logging
-from datetime import date, datetime
-from functools import cache
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
 from typing import Literal
 
+import orjson
 import polars as pl
 import requests
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "https://cdn.jsdelivr.net/npm/@fawazahmed0/currency-api@{date}/v1/currencies/{currency}.json"
 
+# Shared session so sequential fetches reuse the pooled TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_SESSION.headers["Accept-Encoding"] = "gzip"
+
+# Helper columns used to join rates onto account data; prefixed so they
+# can't collide with the user's own columns
+CURRENCY_KEY = "__finwrap_currency"
+DATE_KEY = "__finwrap_date"
+RATE_KEY = "__finwrap_rate"
+
+# The in-memory payload cache is bounded; RATE_CACHE below keeps every
+# fetched rate on disk, so evicted entries are reloaded without a request
+PAYLOAD_CACHE_SIZE = 1_024
+
+
+class _PayloadCache:
+    """thread-safe LRU of rate payloads keyed by (from_currency, date)
+
+    Entries put with a ``ttl`` (the "latest" payloads) expire, so a
+    long-running process picks up new rates.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[
+            tuple[str, str], tuple[dict[str, float], float | None]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> dict[str, float] | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            rates, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return rates
+
+    def put(
+        self,
+        key: tuple[str, str],
+        rates: dict[str, float],
+        ttl: timedelta | None = None,
+    ) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl.total_seconds()
+        with self._lock:
+            self._data[key] = (rates, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Payloads of both the sync and the batch fetch paths
+_PAYLOADS = _PayloadCache(PAYLOAD_CACHE_SIZE)
+
+
+def default_rate_cache_path() -> Path:
+    return (
+        Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+        / "finwrap"
+        / "rates.sqlite"
+    )
+
+
+class PersistentRateCache:
+    """SQLite store of fetched rates, shared across processes and runs.
+
+    Dated rates never change once published. "latest" rates are considered
+    stale after ``latest_ttl``. The cache is optional: if the database
+    can't be opened it turns itself off and rates come from the network.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        latest_ttl: timedelta = timedelta(hours=24),
+    ):
+        # None resolves to default_rate_cache_path() on first use
+        self.path = path
+        self.latest_ttl = latest_ttl
+        self._conn: sqlite3.Connection | None = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._conn is None and not self._disabled:
+            path = self.path or default_rate_cache_path()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS rates (
+                        from_cur TEXT NOT NULL,
+                        to_cur TEXT NOT NULL,
+                        date TEXT NOT NULL,
+                        rate REAL NOT NULL,
+                        fetched_at TEXT NOT NULL,
+                        PRIMARY KEY (from_cur, to_cur, date)
+                    )
+                    """
+                )
+                conn.commit()
+            except (OSError, sqlite3.Error) as e:
+                logging.getLogger(__name__).warning(
+                    f"rate cache at {path} disabled: {e}"
+                )
+                self._disabled = True
+            else:
+                self._conn = conn
+        return self._conn
+
+    def get_rates(self, from_currency: str, date_str: str) -> dict[str, float] | None:
+        """every stored rate from ``from_currency`` on ``date_str``"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                if conn is None:
+                    return None
+                rows = conn.execute(
+                    "SELECT to_cur, rate, fetched_at FROM rates WHERE from_cur = ? AND date = ?",
+                    (from_currency, date_str),
+                ).fetchall()
+        except (OSError, sqlite3.Error) as e:
+            logging.getLogger(__name__).warning(f"rate cache unavailable: {e}")
+            return None
+        if not rows:
+            return None
+        if date_str == "latest" and any(
+            datetime.now() - datetime.fromisoformat(fetched_at) > self.latest_ttl
+            for _, _, fetched_at in rows
+        ):
+            return None
+        return {to_currency: rate for to_currency, rate, _ in rows}
+
+    def set_rates(
+        self, from_currency: str, date_str: str, rates: dict[str, float]
+    ) -> None:
+        fetched_at = datetime.now().isoformat()
+        try:
+            with self._lock:
+                conn = self._connect()
+                if conn is None:
+                    return
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rates VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (from_currency, to_currency, date_str, rate, fetched_at)
+                        for to_currency, rate in rates.items()
+                    ),
+                )
+                conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            logging.getLogger(__name__).warning(f"rate cache unavailable: {e}")
+
+
+RATE_CACHE = PersistentRateCache()
+
+
+def _format_date(date_input: date | datetime | Literal["latest"]) -> str:
+    return (
+        date_input.strftime("%F")
+        if isinstance(date_input, (date, datetime))
+        else date_input
+    )
+
+
+def _resolve_rate(
+    rate: float | None,
+    from_currency: str,
+    to_currency: str,
+    default_rate: float | None,
+) -> float | None:
+    if rate is None and default_rate is None:
+        raise ValueError(
+            f"Unable to fetch exchange rate for {from_currency.upper()}/{to_currency.upper()} and no default_rate was specified."
+        )
+    elif rate is not None:
+        return rate
+    return default_rate
+
+
+def _parse_rates(response: requests.Response, from_currency: str) -> dict[str, float]:
+    if not 200 <= response.status_code < 300:
+        logging.getLogger(__name__).warning(
+            f"fetching {from_currency} rates failed with HTTP {response.status_code}"
+        )
+        return {}
+    if response.headers.get("Content-Length") == "0":
+        return {}
+    return orjson.loads(response.content).get(from_currency, {})
+
+
+def _rates_url(from_currency: str, date_str: str) -> str:
+    return BASE_URL.format(currency=from_currency, date=date_str)
+
+
+def _stored_rates(from_currency: str, date_str: str) -> dict[str, float] | None:
+    """rates from the persistent cache, or None when they must be fetched"""
+    rates = RATE_CACHE.get_rates(from_currency, date_str)
+    if rates is None:
+        logging.getLogger(__name__).info(
+            f"fetching {from_currency} rates for {date_str!r}"
+        )
+    return rates
+
+
+def _store_rates(
+    response: requests.Response,
+    from_currency: str,
+    date_str: str,
+) -> dict[str, float]:
+    """parse a fetched payload and write it to the persistent cache"""
+    rates = _parse_rates(response, from_currency)
+    if rates:
+        RATE_CACHE.set_rates(from_currency, date_str, rates)
+    return rates
+
+
+def _fetch_rates_for(from_currency: str, date_str: str) -> dict[str, float]:
+    """every rate from ``from_currency`` on ``date_str``, one request per pair"""
+    rates = _PAYLOADS.get((from_currency, date_str))
+    if rates is None:
+        rates = _stored_rates(from_currency, date_str)
+        if rates is None:
+            response = _SESSION.get(
+                _rates_url(from_currency, date_str), timeout=10
+            )
+            rates = _store_rates(response, from_currency, date_str)
+        ttl = RATE_CACHE.latest_ttl if date_str == "latest" else None
+        _PAYLOADS.put((from_currency, date_str), rates, ttl)
+    return rates
+
 
-@cache
 def get_currency_rate(
     from_currency: str,
     to_currency: str,
     date_input: date | datetime | Literal["latest"],
     default_rate: float | None = None,
 ) -> float | None:
-    logging.getLogger(__name__).info(
-        f"fetching {from_currency}/{to_currency} for {date_input!r}"
-    )
     from_currency = from_currency.lower()
     to_currency = to_currency.lower()
-    date_str = (
-        date_input.strftime("%F")
-        if isinstance(date_input, (date, datetime))
-        else date_input
+    rates = _fetch_rates_for(from_currency, _format_date(date_input))
+    return _resolve_rate(
+        rates.get(to_currency), from_currency, to_currency, default_rate
     )
-    url = BASE_URL.format(currency=from_currency, date=date_str)
-    response = requests.get(url)
-    if response.status_code % 200 == 0:
-        rate = response.json().get(from_currency, {}).get(to_currency)
-        if rate is None and default_rate is None:
-            raise ValueError(
-                f"Unable to fetch exchange rate for {from_currency.upper()}/{to_currency.upper()} and no default_rate was specified."
-            )
-        elif rate is not None:
-            return rate
-    return default_rate
 
 
 def get_currency_rate_batches(
-    from_currency: list[str],
+    from_currency: pl.Series,
     to_currency: str,
-    date_input: list[date | datetime | Literal["latest"]],
+    date_input: pl.Series,
     default_rate: float | None = None,
+    max_workers: int = 16,
 ) -> pl.Series:
-    return pl.Series(
-        "rate",
-        values=(
-            get_currency_rate(c, to_currency, d)
-            for c, d in zip(from_currency, date_input)
-        ),
-        dtype=pl.Float64,
+    """rates for each row, fetching only the distinct (currency, day) pairs"""
+    to_currency = to_currency.lower()
+    keys = pl.DataFrame(
+        {
+            "currency_col": from_currency.str.to_lowercase(),
+            "date_col": date_input.dt.strftime("%F"),
+        }
+    ).with_row_index()
+    unique = keys.select("currency_col", "date_col").unique().drop_nulls()
+
+    # keep this batch's payloads locally, other batches may evict them
+    payloads: dict[tuple[str, str], dict[str, float]] = {}
+    missing: set[tuple[str, str]] = set()
+    for c, d in unique.iter_rows():
+        if c == to_currency:
+            continue
+        cached = _PAYLOADS.get((c, d))
+        if cached is None:
+            missing.add((c, d))
+        else:
+            payloads[(c, d)] = cached
+    if missing:
+        # threads rather than asyncio: polars may call this from a thread
+        # whose caller already runs an event loop (e.g. Jupyter)
+        ordered = list(missing)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = executor.map(lambda key: _fetch_rates_for(*key), ordered)
+            payloads.update(zip(ordered, fetched))
+
+    rate_table = unique.with_columns(
+        rate=pl.Series(
+            [
+                1.0
+                if c == to_currency
+                else _resolve_rate(
+                    payloads[(c, d)].get(to_currency),
+                    c,
+                    to_currency,
+                    default_rate,
+                )
+                for c, d in unique.iter_rows()
+            ],
+            dtype=pl.Float64,
+        )
+    )
+    return (
+        keys.join(rate_table, on=["currency_col", "date_col"], how="left")
+        .sort("index")
+        .get_column("rate")
+    )
+
+
+def get_latest_rate_batches(
+    from_currency: pl.Series,
+    to_currency: str,
+    default_rate: float | None = None,
+    max_workers: int = 16,
+) -> pl.Series:
+    """latest rates for each row, fetching the distinct currencies in parallel"""
+    currencies = [
+        c
+        for c in from_currency.unique().drop_nulls()
+        if c.lower() != to_currency.lower()
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rates = executor.map(
+            lambda c: get_currency_rate(c, to_currency, "latest", default_rate),
+            currencies,
+        )
+        mapping = dict(zip(currencies, rates))
+    return from_currency.replace_strict(
+        mapping, default=1.0, return_dtype=pl.Float64
     )
 
 
@@ -62,40 +361,35 @@ class Currency(BaseModel):
     default_rate: float | None = None
     strategy: Literal["dynamic", "latest"] = "latest"
 
-    def rate(self, date_expr: pl.Expr) -> pl.Expr:
-        currency_col = pl.col(self.currency_col).alias("currency_col")
-        date_col = date_expr.alias("date_col")
+    def _rates(self, pairs: pl.DataFrame) -> pl.Series:
         if self.strategy == "dynamic":
-            return (
-                pl.when(currency_col != self.convert_to)
-                .then(
-                    pl.struct(currency_col, date_col).map_batches(
-                        lambda x: get_currency_rate_batches(
-                            x.struct.field("currency_col"),  # type: ignore
-                            self.convert_to,
-                            x.struct.field("date_col"),  # type: ignore
-                            self.default_rate,
-                        ),
-                        return_dtype=pl.Float64,
-                    )
-                )
-                .otherwise(pl.lit(1.0))
+            return get_currency_rate_batches(
+                pairs.get_column(CURRENCY_KEY),
+                self.convert_to,
+                pairs.get_column(DATE_KEY),
+                self.default_rate,
             )
         elif self.strategy == "latest":
-            return (
-                pl.when(currency_col != self.convert_to)
-                .then(
-                    currency_col.map_elements(
-                        lambda x: get_currency_rate(
-                            x,  # type: ignore
-                            self.convert_to,
-                            "latest",  # type: ignore
-                            self.default_rate,
-                        ),
-                        return_dtype=pl.Float64,
-                    )
-                )
-                .otherwise(pl.lit(1.0))
+            return get_latest_rate_batches(
+                pairs.get_column(CURRENCY_KEY),
+                self.convert_to,
+                self.default_rate,
             )
         else:
             raise ValueError(f"Strategy {self.strategy} is not valid.")
+
+    def rates_frame(self, pairs: pl.LazyFrame) -> pl.LazyFrame:
+        """a ``CURRENCY_KEY``, ``DATE_KEY``, ``RATE_KEY`` table to join against
+
+        ``pairs`` holds the ``CURRENCY_KEY`` (String) and ``DATE_KEY`` (Date)
+        columns of the data; rates are fetched once per distinct pair when
+        the plan is executed.
+        """
+        return pairs.unique().map_batches(
+            lambda df: df.with_columns(self._rates(df).alias(RATE_KEY)),
+            schema={
+                CURRENCY_KEY: pl.String,
+                DATE_KEY: pl.Date,
+                RATE_KEY: pl.Float64,
+            },
+        )
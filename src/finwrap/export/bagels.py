@@ -1,5 +1,7 @@
 import datetime
+import functools
 import logging
+import os
 import subprocess
 from pathlib import Path
 from typing import Iterable
@@ -9,7 +11,6 @@ import typer
 from sqlalchemy import (
     Connection,
     MetaData,
-    Table,
     create_engine,
     func,
     insert,
@@ -19,6 +20,7 @@ from sqlalchemy import (
 from finwrap.models import Account, AccountCollection
 
 METADATA = MetaData()
+WRITE_CHUNK_SIZE = 10_000
 
 # Configure logging
 logging.basicConfig(
@@ -31,7 +33,11 @@ logger = logging.getLogger(__name__)
 class BinaryNotFoundError(Exception): ...
 
 
+@functools.cache
 def locate_database() -> Path:
+    if env_path := os.environ.get("FINWRAP_BAGELS_DB"):
+        logger.debug(f"Database set by FINWRAP_BAGELS_DB: {env_path}")
+        return Path(env_path).resolve()
     try:
         logger.info("Attempting to locate database")
         res = str(
@@ -43,7 +49,7 @@ def locate_database() -> Path:
             .decode("utf-8")
         )
         logger.debug(f"Database located at: {res}")
-        return Path(res)
+        return Path(res).resolve()
 
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
         logger.error("Failed to locate bagels binary")
@@ -53,51 +59,66 @@ def locate_database() -> Path:
 
 
 def get_max_id(table_name: str, conn: Connection) -> int:
-    tb = Table(table_name, METADATA, autoload_with=conn)
+    tb = METADATA.tables[table_name]
     return conn.execute(select(func.max(tb.c.id))).scalar_one()
 
 
+def has_rows(table_name: str, conn: Connection) -> bool:
+    tb = METADATA.tables[table_name]
+    return conn.execute(select(select(tb.c.id).exists())).scalar_one()
+
+
 def create_cateogry(name: str, color: str, conn: Connection) -> int:
+    table = METADATA.tables["category"]
+    existing_id = conn.execute(
+        select(table.c.id)
+        .where(table.c.name == name)
+        .order_by(table.c.id)
+        .limit(1)
+    ).scalar_one_or_none()
+    if existing_id is not None:
+        logger.debug(f"Using existing category: {name}")
+        return existing_id
+
     logger.info(f"Creating category: {name}")
-    table = Table("category", METADATA, autoload_with=conn)
     now = datetime.datetime.now()
-    conn.execute(
-        insert(table).values(
+    category_id = conn.execute(
+        insert(table)
+        .values(
             name=name,
             createdAt=now,
             updatedAt=now,
             nature="NEED",
             color=color,
         )
-    )
+        .returning(table.c.id)
+    ).scalar_one()
     conn.commit()
-
-    return list(
-        conn.execute(select(table.c.id).where(table.c.name == name))
-        .scalars()
-        .all()
-    )[0]
+    return category_id
 
 
 def create_accounts(account_names: Iterable[str], conn: Connection):
     logger.info("Creating accounts")
-    account_table = Table("account", METADATA, autoload_with=conn)
+    account_table = METADATA.tables["account"]
     existing_accounts = set(
         conn.execute(select(account_table.c.name)).scalars().all()
     )
-    for name in account_names:
-        if name not in existing_accounts:
-            logger.debug(f"Creating account: {name}")
-            conn.execute(
-                insert(account_table).values(
-                    name=name,
-                    description="Imported with finwrap",
-                    createdAt=datetime.datetime.now(),
-                    updatedAt=datetime.datetime.now(),
-                    beginningBalance=0.0,
-                    hidden=0,
-                )
-            )
+    now = datetime.datetime.now()
+    rows = [
+        dict(
+            name=name,
+            description="Imported with finwrap",
+            createdAt=now,
+            updatedAt=now,
+            beginningBalance=0.0,
+            hidden=0,
+        )
+        for name in account_names
+        if name not in existing_accounts
+    ]
+    if rows:
+        logger.debug(f"Creating accounts: {[row['name'] for row in rows]}")
+        conn.execute(insert(account_table), rows)
     conn.commit()
 
 
@@ -165,7 +186,7 @@ def save_to_bagel(account: Account | AccountCollection):
     logger.info("Starting save to bagel")
     data = account.get_data()
     db_path = locate_database()
-    engine = create_engine("sqlite:///" + str(db_path.resolve()))
+    engine = create_engine("sqlite:///" + str(db_path))
     METADATA.reflect(engine)
     account_names = prepare_account_names(data)
 
@@ -174,32 +195,25 @@ def save_to_bagel(account: Account | AccountCollection):
         category_id = create_cateogry("imported", "blue", conn)
         account_table = get_table("account", conn)
 
-        now = datetime.datetime.now()
-        now_expr = pl.datetime(
-            year=now.year,
-            month=now.month,
-            day=now.day,
-            hour=now.hour,
-            minute=now.minute,
-            second=now.second,
-            microsecond=now.microsecond,
-        )
-
-        record_table = get_table("record", conn)
+        now_expr = pl.lit(datetime.datetime.now()).cast(pl.Datetime("us"))
 
         df = prepare_dataframe(data, account_table, category_id, now_expr)
 
-        if record_table.count().collect().item(0, 0) > 0:
+        if has_rows("record", conn):
             logger.debug("Processing existing records")
-            record_table = process_record_table(record_table)
+            record_table = process_record_table(get_table("record", conn))
             df = df.join(
                 record_table, how="anti", on=["label", "amount", "date"]
             )
 
         df = df.collect()
-        if df.is_empty():
+        if not df.is_empty():
             logger.info(f"Writing {len(df):,} records to database")
-            df.write_database("record", conn, if_table_exists="append")
+            # keep every chunk in a single transaction
+            if not conn.in_transaction():
+                conn.begin()
+            for chunk in df.iter_slices(WRITE_CHUNK_SIZE):
+                chunk.write_database("record", conn, if_table_exists="append")
             conn.commit()
             logger.info("Save completed successfully")
         else:
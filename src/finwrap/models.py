@@ -1,18 +1,24 @@
+import re
 from enum import Enum
+from functools import cached_property
 from pathlib import Path
 from typing import Annotated, Callable, TypeAlias
 
 import polars as pl
 import yaml
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from pydantic.functional_serializers import PlainSerializer
 
-from .currency import Currency
+from .currency import CURRENCY_KEY, DATE_KEY, RATE_KEY, Currency
 
 _Path = Annotated[Path, PlainSerializer(lambda x: str(x.resolve()), return_type=str)]
 
 FilePath: TypeAlias = _Path | list[_Path] | str | list[str]
 
+# A bracketed set of literal characters, e.g. "[*#]"; these can be stripped
+# with str.replace_many instead of the regex engine
+_SIMPLE_CHAR_CLASS = re.compile(r"\[([^\\\[\]^&~-]+)\]")
+
 
 class FileType(Enum):
     CSV = ".csv"
@@ -21,34 +27,58 @@ class FileType(Enum):
     EXCEL_OLD = ".xls"
 
 
+_SUFFIX_TO_TYPE: dict[str, FileType] = {ft.value: ft for ft in FileType}
+
+
+def _read_excel(source, columns: list[str] | None = None) -> pl.LazyFrame:
+    """Excel is read eagerly, so only decode the columns that are needed"""
+    return pl.read_excel(source, engine="calamine", columns=columns).lazy()
+
+
+# Lazy scans get projection pushdown from the planner and ignore `columns`.
+# A list of files is already scanned in parallel by polars.
 FILE_READERS: dict[FileType, Callable[..., pl.LazyFrame]] = {
-    FileType.CSV: pl.scan_csv,
-    FileType.PARQUET: pl.scan_parquet,
-    FileType.EXCEL: lambda x: pl.read_excel(x).lazy(),
-    FileType.EXCEL_OLD: lambda x: pl.read_excel(x).lazy(),
+    FileType.CSV: lambda x, columns=None: pl.scan_csv(x),
+    FileType.PARQUET: lambda x, columns=None: pl.scan_parquet(x),
+    FileType.EXCEL: _read_excel,
+    FileType.EXCEL_OLD: _read_excel,
 }
 
 
+def _required_columns(data: dict) -> list[str]:
+    """source columns an Account reads, given its validated fields"""
+    currency = data.get("currency")
+    cols = [
+        data.get("date_col"),
+        data.get("transaction_col"),
+        data.get("amount_col"),
+        data.get("fees_col"),
+        currency.currency_col if currency is not None else None,
+    ]
+    return list(dict.fromkeys(c for c in cols if c))
+
+
 def _read_data(
     file_path: FilePath,
+    columns: list[str] | None = None,
 ) -> pl.LazyFrame:
     """return a LazyFrame based on the appropriate suffix"""
     if isinstance(file_path, (list)):
         suffix = Path(file_path[0]).suffix
-        file_type = next((ft for ft in FileType if ft.value == suffix), None)
+        file_type = _SUFFIX_TO_TYPE.get(suffix)
 
         if file_type is None:
             raise ValueError(
                 f"Unsupported file type for {file_path} with suffix {suffix}"
             )
 
-        if not all(Path(p).suffix == suffix for p in file_path):
+        if {Path(p).suffix for p in file_path} != {suffix}:
             raise ValueError("All files must have the same suffix")
 
-        return FILE_READERS[file_type](file_path)
+        return FILE_READERS[file_type](file_path, columns=columns)
 
     elif isinstance(file_path, (str, Path)):
-        return _read_data([str(file_path)])
+        return _read_data([str(file_path)], columns)
 
 
 class Account(BaseModel, arbitrary_types_allowed=True):
@@ -64,16 +94,28 @@ class Account(BaseModel, arbitrary_types_allowed=True):
 
     # Internals
     data: pl.LazyFrame = Field(
-        default_factory=lambda data: _read_data(data["file_path"]),
-        repr=False,
-        exclude=True,
-    )
-    data_schema: pl.Schema = Field(
-        default_factory=lambda data: data["data"].collect_schema(),
+        default_factory=lambda data: _read_data(
+            data["file_path"], _required_columns(data)
+        ),
         repr=False,
         exclude=True,
     )
 
+    @field_validator("transaction_col_cleaning_regex")
+    @classmethod
+    def _validate_cleaning_regex(cls, value: str | None) -> str | None:
+        # compile with polars' own (Rust) regex engine, which runs the scan
+        if value is not None:
+            try:
+                pl.Series([""], dtype=pl.String).str.contains(value)
+            except pl.exceptions.PolarsError as e:
+                raise ValueError(f"Invalid cleaning regex {value!r}: {e}") from e
+        return value
+
+    @cached_property
+    def data_schema(self) -> pl.Schema:
+        return self.data.collect_schema()
+
     def save(self, fname: str):
         with open(fname, "w") as f:
             f.write(yaml.dump(self.model_dump()))
@@ -95,7 +137,8 @@ class Account(BaseModel, arbitrary_types_allowed=True):
             amount_val -= pl.col(self.fees_col)
 
         if self.currency is not None:
-            amount_val *= self.currency.rate(self.date)
+            # joined onto the data by _raw_select
+            amount_val *= pl.col(RATE_KEY).fill_null(1.0)
 
         return amount_val
 
@@ -114,26 +157,44 @@ class Account(BaseModel, arbitrary_types_allowed=True):
     @property
     def transaction(self) -> pl.Expr:
         col = pl.col(self.transaction_col)
-        if self.transaction_col_cleaning_regex:
-            col = col.str.replace_all(self.transaction_col_cleaning_regex, "")
+        regex = self.transaction_col_cleaning_regex
+        if regex:
+            if match := _SIMPLE_CHAR_CLASS.fullmatch(regex):
+                chars = list(dict.fromkeys(match.group(1)))
+                col = col.str.replace_many(chars, [""] * len(chars))
+            else:
+                col = col.str.replace_all(regex, "")
         return col.str.strip_chars()
 
-    def get_data(self) -> pl.LazyFrame:
+    def _raw_select(self) -> pl.LazyFrame:
+        """normalized columns, without the sort and dedup of get_data"""
         for col in [self.date_col, self.transaction_col, self.transaction_col]:
             assert (
                 col in self.data_schema.names()
             ), f"{col} is not in data columns: {self.data.columns}. col={col}; cols: {self.data.columns}"
-        return (
-            self.data.sort(self.date_col)
-            .select(
-                account_name=pl.lit(self.name),
-                date=self.date,
-                transaction=self.transaction,
-                amount=self.amount,
+        data = self.data
+        if self.currency is not None:
+            data = data.with_columns(
+                pl.col(self.currency.currency_col)
+                .cast(pl.String)
+                .alias(CURRENCY_KEY),
+                self.date.dt.date().alias(DATE_KEY),
             )
-            .unique()
+            data = data.join(
+                self.currency.rates_frame(data.select(CURRENCY_KEY, DATE_KEY)),
+                on=[CURRENCY_KEY, DATE_KEY],
+                how="left",
+            )
+        return data.select(
+            account_name=pl.lit(self.name),
+            date=self.date,
+            transaction=self.transaction,
+            amount=self.amount,
         )
 
+    def get_data(self) -> pl.LazyFrame:
+        return self._raw_select().unique().sort("date")
+
 
 class AccountCollection(BaseModel, arbitrary_types_allowed=True):
     accounts: list[Account]
@@ -148,7 +209,11 @@ class AccountCollection(BaseModel, arbitrary_types_allowed=True):
             return cls.model_validate(yaml.safe_load(f.read()))
 
     def get_data(self) -> pl.LazyFrame:
-        return pl.concat(
-            [d.get_data().lazy() for d in self.accounts],
-            how="vertical",
+        return (
+            pl.concat(
+                [d._raw_select() for d in self.accounts],
+                how="vertical",
+            )
+            .unique()
+            .sort("date")
         )
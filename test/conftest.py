@@ -0,0 +1,23 @@
+import pytest
+from finwrap import currency
+from finwrap.currency import PersistentRateCache
+
+
+@pytest.fixture
+def rate_cache(tmp_path, monkeypatch):
+    # Point the persistent cache at a temporary XDG_CACHE_HOME
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cache = PersistentRateCache()
+    monkeypatch.setattr(currency, "RATE_CACHE", cache)
+    currency._PAYLOADS.clear()
+    yield cache
+    currency._PAYLOADS.clear()
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    # Fail loudly if anything reaches the network
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected network request")
+
+    monkeypatch.setattr(currency._SESSION, "get", fail)
@@ -4,6 +4,7 @@ from pathlib import Path
 
 import pytest
 from finwrap import Account
+from finwrap.currency import Currency
 
 
 @pytest.fixture
@@ -127,3 +128,112 @@ def test_save_and_load_with_multiple_files(sample_csv):
     finally:
         os.unlink(temp_path)
         os.unlink(second_csv)
+
+
+def test_invalid_cleaning_regex(sample_csv):
+    # An invalid regex should fail at construction, not mid-scan
+    with pytest.raises(ValueError):
+        Account(
+            file_path=sample_csv,
+            name="Test Account",
+            date_col="date",
+            amount_col="amount",
+            transaction_col="description",
+            transaction_col_cleaning_regex="(unclosed",
+        )
+
+
+def test_cleaning_regex_uses_polars_syntax(sample_csv):
+    # Valid for polars' regex engine even though Python's re rejects it
+    account = Account(
+        file_path=sample_csv,
+        name="Test Account",
+        date_col="date",
+        amount_col="amount",
+        transaction_col="description",
+        transaction_col_cleaning_regex=r"\p{Han}",
+    )
+    assert account.transaction_col_cleaning_regex == r"\p{Han}"
+
+
+def test_cleaning_regex_unsupported_by_polars(sample_csv):
+    # Look-around compiles in Python's re but not in polars
+    with pytest.raises(ValueError):
+        Account(
+            file_path=sample_csv,
+            name="Test Account",
+            date_col="date",
+            amount_col="amount",
+            transaction_col="description",
+            transaction_col_cleaning_regex="(?=x)",
+        )
+
+
+def test_cleaning_regex_can_be_changed(sample_csv):
+    # Changing the regex after a first read applies to the next read
+    account = Account(
+        file_path=sample_csv,
+        name="Test Account",
+        date_col="date",
+        amount_col="amount",
+        transaction_col="description",
+    )
+    account.get_data().collect()
+    account.transaction_col_cleaning_regex = r"\s*[0-9]+"
+
+    transactions = account.get_data().collect().get_column("transaction")
+    assert transactions.to_list() == ["Test Transaction", "Test Transaction"]
+
+
+def test_currency_conversion(tmp_path, rate_cache, offline):
+    csv = tmp_path / "mixed.csv"
+    csv.write_text(
+        "date,amount,description,currency\n"
+        "2023-01-01,10.00,Coffee,USD\n"
+        "2023-01-02,40.00,Books,USD\n"
+        "2023-01-02,3.00,Bread,EUR\n"
+    )
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5})
+    rate_cache.set_rates("usd", "2023-01-02", {"eur": 0.25})
+
+    account = Account(
+        file_path=csv,
+        name="Test Account",
+        date_col="date",
+        amount_col="amount",
+        transaction_col="description",
+        date_col_format="%Y-%m-%d",
+        currency=Currency(
+            currency_col="currency", convert_to="EUR", strategy="dynamic"
+        ),
+    )
+    data = account.get_data().collect().sort("date", "transaction")
+
+    assert data.columns == ["account_name", "date", "transaction", "amount"]
+    assert data.get_column("amount").to_list() == [5.0, 10.0, 3.0]
+
+
+def test_currency_conversion_ignores_user_rate_column(
+    tmp_path, rate_cache, offline
+):
+    # A "rate" column in the data must not be mistaken for the fetched rate
+    csv = tmp_path / "with_rate.csv"
+    csv.write_text(
+        "date,amount,description,currency,rate\n"
+        "2023-01-01,10.00,Coffee,USD,7.0\n"
+        "2023-01-02,40.00,Books,USD,7.0\n"
+    )
+    rate_cache.set_rates("usd", "latest", {"eur": 0.5})
+
+    account = Account(
+        file_path=csv,
+        name="Test Account",
+        date_col="date",
+        amount_col="amount",
+        transaction_col="description",
+        date_col_format="%Y-%m-%d",
+        currency=Currency(currency_col="currency", convert_to="EUR"),
+    )
+    data = account.get_data().collect()
+
+    assert data.get_column("amount").to_list() == [5.0, 20.0]
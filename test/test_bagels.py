@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pandas")
+pytest.importorskip("typer")
+
+from finwrap import Account  # noqa: E402
+from finwrap.export import bagels  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE account (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    createdAt DATETIME,
+    updatedAt DATETIME,
+    beginningBalance REAL,
+    hidden BOOLEAN
+);
+CREATE TABLE category (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    createdAt DATETIME,
+    updatedAt DATETIME,
+    nature TEXT,
+    color TEXT
+);
+CREATE TABLE record (
+    id INTEGER PRIMARY KEY,
+    createdAt DATETIME,
+    updatedAt DATETIME,
+    label TEXT,
+    amount REAL,
+    date DATETIME,
+    accountId INTEGER,
+    categoryId INTEGER,
+    isIncome BOOLEAN,
+    isInProgress BOOLEAN,
+    isTransfer BOOLEAN
+);
+"""
+
+
+@pytest.fixture
+def bagels_db(tmp_path, monkeypatch):
+    # An empty bagels database, located through FINWRAP_BAGELS_DB
+    db_path = tmp_path / "bagels.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(SCHEMA)
+    monkeypatch.setenv("FINWRAP_BAGELS_DB", str(db_path))
+    bagels.locate_database.cache_clear()
+    bagels.METADATA.clear()
+    yield db_path
+    bagels.locate_database.cache_clear()
+    bagels.METADATA.clear()
+
+
+@pytest.fixture
+def account(tmp_path):
+    csv = tmp_path / "transactions.csv"
+    csv.write_text(
+        "date,amount,description\n"
+        "2023-01-01,-100.00,Test Transaction 1\n"
+        "2023-01-02,200.00,Test Transaction 2\n"
+    )
+    return Account(
+        file_path=csv,
+        name="Test Account",
+        date_col="date",
+        amount_col="amount",
+        transaction_col="description",
+        date_col_format="%Y-%m-%d",
+    )
+
+
+def count_rows(db_path, table_name: str) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+
+def test_save_to_bagel_writes_records(bagels_db, account):
+    bagels.save_to_bagel(account)
+
+    assert count_rows(bagels_db, "account") == 1
+    assert count_rows(bagels_db, "record") == 2
+
+
+def test_save_to_bagel_reuses_category(bagels_db, account):
+    # Saving twice keeps a single "imported" category and no duplicates
+    bagels.save_to_bagel(account)
+    bagels.save_to_bagel(account)
+
+    assert count_rows(bagels_db, "category") == 1
+    assert count_rows(bagels_db, "record") == 2
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+from finwrap import currency
+from finwrap.currency import (
+    CURRENCY_KEY,
+    DATE_KEY,
+    RATE_KEY,
+    Currency,
+    PersistentRateCache,
+    get_currency_rate,
+)
+
+
+def test_rate_cache_is_created_under_xdg_cache_home(rate_cache, tmp_path):
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5})
+    assert (tmp_path / "finwrap" / "rates.sqlite").exists()
+
+
+def test_warm_cache_skips_network(rate_cache, offline):
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5, "gbp": 0.25})
+
+    assert get_currency_rate("USD", "EUR", date(2023, 1, 1)) == 0.5
+    assert get_currency_rate("USD", "GBP", date(2023, 1, 1)) == 0.25
+
+
+def test_warm_cache_survives_new_instance(rate_cache, offline, monkeypatch):
+    # A new process opens the same file and reads the stored rates
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5})
+    monkeypatch.setattr(currency, "RATE_CACHE", PersistentRateCache())
+
+    assert get_currency_rate("USD", "EUR", date(2023, 1, 1)) == 0.5
+
+
+def test_latest_rates_expire(tmp_path):
+    cache = PersistentRateCache(
+        tmp_path / "rates.sqlite", latest_ttl=timedelta(seconds=-1)
+    )
+    cache.set_rates("usd", "latest", {"eur": 0.5})
+    cache.set_rates("usd", "2023-01-01", {"eur": 0.4})
+
+    # "latest" is stale straight away, dated rates never expire
+    assert cache.get_rates("usd", "latest") is None
+    assert cache.get_rates("usd", "2023-01-01") == {"eur": 0.4}
+
+
+def test_unwritable_cache_falls_back_to_network(tmp_path, monkeypatch):
+    # A file where the cache directory should be makes mkdir fail
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(blocker))
+    monkeypatch.setattr(currency, "RATE_CACHE", PersistentRateCache())
+    currency._PAYLOADS.clear()
+
+    class Response:
+        status_code = 200
+        headers: dict = {}
+        content = b'{"usd": {"eur": 0.5}}'
+
+    monkeypatch.setattr(currency._SESSION, "get", lambda *a, **kw: Response())
+
+    try:
+        assert get_currency_rate("USD", "EUR", date(2023, 1, 1)) == 0.5
+        assert currency.RATE_CACHE.get_rates("usd", "2023-01-01") is None
+    finally:
+        currency._PAYLOADS.clear()
+
+
+def test_rates_frame(rate_cache, offline):
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5})
+    rate_cache.set_rates("usd", "2023-01-02", {"eur": 0.25})
+    pairs = pl.LazyFrame(
+        {
+            CURRENCY_KEY: ["USD", "USD", "EUR", "USD"],
+            DATE_KEY: [
+                date(2023, 1, 1),
+                date(2023, 1, 1),
+                date(2023, 1, 1),
+                date(2023, 1, 2),
+            ],
+        }
+    )
+    rates = (
+        Currency(currency_col="currency", convert_to="EUR", strategy="dynamic")
+        .rates_frame(pairs)
+        .collect()
+        .sort(CURRENCY_KEY, DATE_KEY)
+    )
+
+    # One row per distinct pair; the target currency converts at 1.0
+    assert rates.columns == [CURRENCY_KEY, DATE_KEY, RATE_KEY]
+    assert rates.rows() == [
+        ("EUR", date(2023, 1, 1), 1.0),
+        ("USD", date(2023, 1, 1), 0.5),
+        ("USD", date(2023, 1, 2), 0.25),
+    ]
+
+
+def test_dynamic_rates_inside_running_event_loop(rate_cache, offline):
+    # Collecting from async code (e.g. Jupyter) must not need a new loop
+    rate_cache.set_rates("usd", "2023-01-01", {"eur": 0.5})
+    pairs = pl.LazyFrame({CURRENCY_KEY: ["USD"], DATE_KEY: [date(2023, 1, 1)]})
+    dynamic = Currency(
+        currency_col="currency", convert_to="EUR", strategy="dynamic"
+    )
+
+    async def collect() -> pl.DataFrame:
+        return dynamic.rates_frame(pairs).collect()
+
+    rates = asyncio.run(collect())
+    assert rates.get_column(RATE_KEY).to_list() == [0.5]
+
+
+def test_latest_rates_expire_in_memory(tmp_path, monkeypatch):
+    # A long-running process must not keep "latest" rates forever
+    cache = PersistentRateCache(
+        tmp_path / "rates.sqlite", latest_ttl=timedelta(seconds=-1)
+    )
+    monkeypatch.setattr(currency, "RATE_CACHE", cache)
+    currency._PAYLOADS.clear()
+    responses = iter([b'{"usd": {"eur": 0.5}}', b'{"usd": {"eur": 0.4}}'])
+
+    class Response:
+        status_code = 200
+        headers: dict = {}
+
+        def __init__(self):
+            self.content = next(responses)
+
+    monkeypatch.setattr(currency._SESSION, "get", lambda *a, **kw: Response())
+
+    try:
+        assert get_currency_rate("USD", "EUR", "latest") == 0.5
+        assert get_currency_rate("USD", "EUR", "latest") == 0.4
+    finally:
+        currency._PAYLOADS.clear()
+
+
+@pytest.fixture
+def not_found(rate_cache, monkeypatch):
+    # The currency API answers every request with a 404
+    class Response:
+        status_code = 404
+        headers: dict = {}
+        content = b"Not Found"
+
+    monkeypatch.setattr(currency._SESSION, "get", lambda *a, **kw: Response())
+
+
+def test_failed_response_returns_default_rate(not_found):
+    assert get_currency_rate("USD", "EUR", date(2023, 1, 1), 1.0) == 1.0
+
+
+def test_failed_response_without_default_rate_raises(not_found):
+    with pytest.raises(ValueError):
+        get_currency_rate("USD", "EUR", date(2023, 1, 1))